@@ -1,11 +1,19 @@
 """Gradio Chat UI"""
+import asyncio
+import time
 import gradio as gr
 import httpx
-import uuid
+import secrets
 import os
-from typing import Generator
+from typing import AsyncGenerator
 
 API_URL = os.getenv("API_URL", "http://localhost:8000")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "10")) * 1024 * 1024
+
+# Cap chatbot re-renders at 20 Hz
+UI_UPDATE_INTERVAL = 0.05
+
+CLIENT = httpx.AsyncClient(http2=True, timeout=120, limits=httpx.Limits(max_keepalive_connections=32, max_connections=64))
 
 # Custom CSS for ChatGPT-like Glassmorphism look
 CSS = """
@@ -56,59 +64,71 @@ textarea {
 }
 """
 
-def stream_response(message: str, history: list) -> Generator[str, None, None]:
+async def stream_response(message: str, history: list, session_id: str) -> AsyncGenerator[str, None]:
     if not message.strip():
         yield "Please share what's on your mind."
         return
     
     try:
-        with httpx.Client(timeout=120) as client:
-            with client.stream("POST", f"{API_URL}/chat/stream", json={"query": message, "session_id": str(uuid.uuid4())}) as resp:
-                if resp.status_code == 200:
-                    full = ""
-                    for chunk in resp.iter_text():
-                        full += chunk
-                        yield full
-                else:
-                    yield f"Error: {resp.status_code}"
+        async with CLIENT.stream("POST", f"{API_URL}/chat/stream", json={"query": message, "session_id": session_id}) as resp:
+            if resp.status_code == 200:
+                parts, last = [], 0.0
+                async for chunk in resp.aiter_text():
+                    parts.append(chunk)
+                    now = time.monotonic()
+                    if now - last >= UI_UPDATE_INTERVAL:
+                        last = now
+                        yield "".join(parts)
+                yield "".join(parts)
+            else:
+                yield f"Error: {resp.status_code}"
     except httpx.ConnectError:
-        yield from demo_response(message)
+        async for partial in demo_response(message):
+            yield partial
     except Exception as e:
         yield f"Error: {e}"
 
 
-def demo_response(message: str) -> Generator[str, None, None]:
-    import time
+async def demo_response(message: str) -> AsyncGenerator[str, None]:
     responses = {
         "anxiety": "I hear that you are feeling anxious. Let's try to ground ourselves:\n\n**1. Breathing Exercise (4-7-8)**\n- Inhale for 4 seconds.\n- Hold for 7 seconds.\n- Exhale for 8 seconds.\n\n**2. Grounding**\n- Notice 5 things you see, 4 you can touch, 3 you hear.\n\nWould you like to talk more about what's worrying you?",
         "default": "I am here to listen without judgment.\n\nIf you are feeling overwhelmed, remember:\n1. **Breathe** - Deep breaths calm the mind.\n2. **Connect** - Talk to a someone you trust.\n3. **Professional Help** - Seeking therapy is a sign of strength.\n\nHow are you feeling right now?"
     }
     key = "anxiety" if any(x in message.lower() for x in ["anxious", "worry", "stress", "tension"]) else "default"
     text = responses[key]
-    current = ""
-    for char in text:
-        current += char
-        yield current
-        time.sleep(0.008)
+    i = 0
+    while i < len(text):
+        end = min(i + 12, len(text))
+        if end < len(text):
+            space = text.rfind(" ", i + 1, end)
+            end = space + 1 if space != -1 else end
+        i = end
+        yield text[:end]
+        await asyncio.sleep(UI_UPDATE_INTERVAL)
 
 
-def upload_file(file) -> str:
+async def upload_file(file) -> str:
     if not file:
         return "No file selected"
+    # gradio>=5 passes a path string; older releases pass a tempfile wrapper
+    path = file if isinstance(file, str) else file.name
     try:
-        with httpx.Client(timeout=60) as client:
-            with open(file.name, "rb") as f:
-                resp = client.post(f"{API_URL}/documents/upload", files={"file": f})
-            if resp.status_code == 200:
-                data = resp.json()
-                return f"Uploaded: {data['filename']} ({data['chunks']} chunks)"
-            return f"Error: {resp.text}"
+        if os.path.getsize(path) > MAX_UPLOAD_BYTES:
+            return "Error: File too large"
+        with open(path, "rb") as f:
+            resp = await CLIENT.post(f"{API_URL}/documents/upload", files={"file": f}, timeout=60)
+        if resp.status_code == 200:
+            data = resp.json()
+            return f"Uploaded: {data['filename']} ({data['chunks']} chunks)"
+        return f"Error: {resp.text}"
     except Exception as e:
         return f"Error: {e}"
 
 
 with gr.Blocks(title="Wellness Companion", css=CSS, theme=gr.themes.Soft(primary_hue="emerald", radius_size="lg")) as app:
     
+    session = gr.State(lambda: secrets.token_hex(16))
+    
     with gr.Column(elem_id="main-container"):
         gr.Markdown("""
         <div style="text-align: center; margin-bottom: 20px;">
@@ -158,14 +178,14 @@ with gr.Blocks(title="Wellness Companion", css=CSS, theme=gr.themes.Soft(primary
         history = history + [(message, "")]
         return "", history
     
-    def stream_bot(history):
+    async def stream_bot(history, session_id):
         user_msg = history[-1][0]
-        for response in stream_response(user_msg, history[:-1]):
+        async for response in stream_response(user_msg, history[:-1], session_id):
             history[-1] = (user_msg, response)
             yield history
 
-    msg.submit(respond, [msg, chatbot], [msg, chatbot]).then(stream_bot, chatbot, chatbot)
-    send.click(respond, [msg, chatbot], [msg, chatbot]).then(stream_bot, chatbot, chatbot)
+    msg.submit(respond, [msg, chatbot], [msg, chatbot]).then(stream_bot, [chatbot, session], chatbot)
+    send.click(respond, [msg, chatbot], [msg, chatbot]).then(stream_bot, [chatbot, session], chatbot)
     file.change(upload_file, file, upload_status)
 
 
@@ -1,14 +1,17 @@
 """Configuration"""
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
-from functools import lru_cache
 
 
 class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore", frozen=True)
+    
     model_provider: str = Field(default="aws_bedrock", alias="MODEL_PROVIDER")
     llm_model_id: str = Field(default="anthropic.claude-3-sonnet-20240229-v1:0", alias="LLM_MODEL_ID")
     embedding_model_id: str = Field(default="amazon.titan-embed-text-v2:0", alias="EMBEDDING_MODEL_ID")
     embedding_dim: int = Field(default=1024, alias="EMBEDDING_DIM")
+    embed_batch_size: int = Field(default=16, alias="EMBED_BATCH_SIZE")
+    llm_pool_size: int = Field(default=50, alias="LLM_POOL_SIZE")
     
     aws_region: str = Field(default="us-east-1", alias="AWS_REGION")
     aws_access_key_id: str | None = Field(default=None, alias="AWS_ACCESS_KEY_ID")
@@ -18,30 +21,30 @@ class Settings(BaseSettings):
     neo4j_uri: str = Field(default="bolt://localhost:7687", alias="NEO4J_URI")
     neo4j_user: str = Field(default="neo4j", alias="NEO4J_USER")
     neo4j_password: str = Field(default="password", alias="NEO4J_PASSWORD")
+    neo4j_database: str = Field(default="neo4j", alias="NEO4J_DATABASE")
     
     weaviate_url: str = Field(default="http://localhost:8080", alias="WEAVIATE_URL")
     weaviate_class: str = Field(default="MentalWellnessDoc", alias="WEAVIATE_CLASS")
+    weaviate_batch_size: int = Field(default=256, alias="WEAVIATE_BATCH_SIZE")
+    weaviate_batch_concurrency: int = Field(default=4, alias="WEAVIATE_BATCH_CONCURRENCY")
+    weaviate_scalar_quantization: bool = Field(default=False, alias="WEAVIATE_SCALAR_QUANTIZATION")
     
     redis_url: str = Field(default="redis://localhost:6379/0", alias="REDIS_URL")
+    redis_pool_size: int = Field(default=50, alias="REDIS_POOL_SIZE")
     
     api_host: str = Field(default="0.0.0.0", alias="API_HOST")
     api_port: int = Field(default=8000, alias="API_PORT")
+    api_workers: int | None = Field(default=None, alias="WEB_CONCURRENCY")
+    debug: bool = Field(default=False, alias="DEBUG")
     rate_limit: str = Field(default="100/minute", alias="RATE_LIMIT")
     
     session_ttl_hours: int = Field(default=24, alias="SESSION_TTL_HOURS")
     max_history: int = Field(default=50, alias="MAX_HISTORY")
+    semantic_cache: bool = Field(default=False, alias="SEMANTIC_CACHE")
+    semantic_cache_threshold: float = Field(default=0.95, alias="SEMANTIC_CACHE_THRESHOLD")
     
     upload_dir: str = Field(default="uploads", alias="UPLOAD_DIR")
     max_upload_mb: int = Field(default=10, alias="MAX_UPLOAD_MB")
 
-    class Config:
-        env_file = ".env"
-        extra = "ignore"
-
-
-@lru_cache
-def get_settings() -> Settings:
-    return Settings()
-
 
-settings = get_settings()
+settings = Settings()
@@ -1,68 +1,29 @@
 """LangGraph Pipeline"""
+import asyncio
 import logging
+import re
 from typing import List
 from langgraph.graph import StateGraph, END
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from langgraph.types import StreamWriter
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
-from graph_rag.services import get_chat_model, get_embedding_model, cache, vectorstore, graphdb
+from graph_rag.config import settings
+from graph_rag.models import GraphState
+from graph_rag.services import get_chat_model, embed_batcher, cache, vectorstore, graphdb
 
 logger = logging.getLogger(__name__)
 
+CRITICAL_KEYWORDS = ("suicide", "kill myself", "end my life", "want to die")
+TOPIC_KEYWORDS = ("anxiety", "depression", "stress", "sleep", "mindfulness", "yoga", "family", "exam", "career", "parents")
+_SCREEN_RE = re.compile(
+    f"(?P<critical>{'|'.join(map(re.escape, CRITICAL_KEYWORDS))})|(?P<topic>{'|'.join(map(re.escape, TOPIC_KEYWORDS))})",
+    re.IGNORECASE,
+)
 
-class PipelineState(dict):
-    pass
+CRISIS_RESPONSE = "I'm deeply concerned about what you've shared. Your life has value.\n\nPlease reach out for help immediately:\n- **Vandrevala Foundation**: 1860-266-2345 (24x7)\n- **KIRAN Helpline**: 1800-599-0019\n- **iCall**: 91529-87821\n\nYou are not alone."
+FALLBACK_RESPONSE = "I apologize, I'm having trouble connecting. If you are in distress, please call the KIRAN Helpline at 1800-599-0019."
 
-
-async def safety_check(state: PipelineState) -> PipelineState:
-    query = state.get("query", "").lower()
-    critical = ["suicide", "kill myself", "end my life", "want to die"]
-    if any(kw in query for kw in critical):
-        return {**state, "safety_triggered": True, "response": [
-            "I'm deeply concerned about what you've shared. Your life has value.\n\nPlease reach out for help immediately:\n- **Vandrevala Foundation**: 1860-266-2345 (24x7)\n- **KIRAN Helpline**: 1800-599-0019\n- **iCall**: 91529-87821\n\nYou are not alone."
-        ]}
-    return {**state, "safety_triggered": False}
-
-
-async def retrieve_context(state: PipelineState) -> PipelineState:
-    if state.get("safety_triggered"):
-        return state
-    
-    query = state.get("query", "")
-    context_parts, sources = [], []
-    
-    try:
-        embedding = cache.get_cached_embedding(query)
-        if not embedding:
-            embedding = get_embedding_model().embed_query(query)
-            cache.cache_embedding(query, embedding)
-        
-        for r in vectorstore.search(embedding, top_k=5):
-            if r.get("content"):
-                context_parts.append(r["content"])
-                sources.append(r.get("chunk_id", ""))
-        
-        topics = [t for t in ["anxiety", "depression", "stress", "sleep", "mindfulness", "yoga", "family", "exam", "career", "parents"] if t in query.lower()]
-        for topic in (topics or ["wellness"])[:3]:
-            for e in (await graphdb.get_related_entities(topic))[:5]:
-                context_parts.append(f"{e.get('source')} → {e.get('target')}")
-    except Exception as e:
-        logger.error(f"Retrieval: {e}")
-    
-    return {**state, "context": "\n\n".join(context_parts), "sources": sources}
-
-
-async def generate_response(state: PipelineState) -> PipelineState:
-    if state.get("safety_triggered"):
-        return state
-    
-    query, context = state.get("query", ""), state.get("context", "")
-    
-    cached = cache.get_cached_response(query)
-    if cached:
-        return {**state, "response": [cached]}
-    
-    system_prompt = """You are a compassionate mental wellness companion.
+SYSTEM_PROMPT = """You are a compassionate mental wellness companion.
     
 Guidelines:
 - Be empathetic, professional, and respectful.
@@ -73,31 +34,110 @@ Guidelines:
 Context:
 {context}"""
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("human", "{query}")
-    ])
+HISTORY_MESSAGES = {"user": HumanMessage, "assistant": AIMessage}
+
+
+async def safety_check(state: GraphState) -> GraphState:
+    topics = []
+    for m in _SCREEN_RE.finditer(state["query"]):
+        if m.lastgroup == "critical":
+            return {"safety_triggered": True, "response": [CRISIS_RESPONSE]}
+        topics.append(m.group().lower())
+    return {"safety_triggered": False, "topics": list(dict.fromkeys(topics))}
+
+
+async def _search_documents(query: str, top_k: int = 5) -> list:
+    results = await cache.get_cached_search(query, top_k)
+    if results is not None:
+        return results
+    embedding = await cache.get_cached_embedding(query)
+    if not embedding:
+        embedding = await embed_batcher.embed(query)
+        await cache.cache_embedding(query, embedding)
+    results = await asyncio.to_thread(vectorstore.search, embedding, top_k=top_k)
+    await cache.cache_search(query, top_k, results)
+    return results
+
+
+async def _retrieve_vectors(query: str) -> tuple[list[str], list[str]]:
+    try:
+        results = await _search_documents(query)
+    except Exception as e:
+        logger.error(f"Vector retrieval: {e}")
+        return [], []
+    hits = [r for r in results if r["content"]]
+    return [r["content"] for r in hits], [r["chunk_id"] for r in hits]
+
+
+async def _retrieve_graph(topics: List[str]) -> list[str]:
+    try:
+        related = await asyncio.gather(*(graphdb.get_related_entities(t) for t in topics[:3]))
+    except Exception as e:
+        logger.error(f"Graph retrieval: {e}")
+        return []
+    return [f"{e['source']} → {e['target']}" for entities in related for e in entities[:5]]
+
+
+async def retrieve_context(state: GraphState) -> GraphState:
+    (documents, sources), facts = await asyncio.gather(
+        _retrieve_vectors(state["query"]),
+        _retrieve_graph(state.get("topics") or ["wellness"]),
+    )
+    return {"context_blocks": documents + facts, "sources": sources}
+
+
+def _chunk_text(content) -> str:
+    # Bedrock Converse streams lists of content blocks
+    if isinstance(content, str):
+        return content
+    return "".join(b if isinstance(b, str) else b.get("text", "") for b in content if isinstance(b, str) or b.get("type") == "text")
+
+
+async def generate_response(state: GraphState, writer: StreamWriter) -> GraphState:
+    query, context = state["query"], "\n\n".join(state.get("context_blocks", ()))
+    history = state.get("history") or []
+    # Follow-up replies depend on the conversation, so only opening turns are cached
+    cacheable = not history
+    
+    cached = await cache.get_cached_response(query) if cacheable else None
+    if cached:
+        return {"response": [cached]}
     
-    chain = prompt | get_chat_model() | StrOutputParser()
+    embedding = await cache.get_cached_embedding(query) if cacheable and settings.semantic_cache else None
+    if embedding:
+        cached = await cache.get_semantic_cached_response(embedding)
+        if cached:
+            return {"response": [cached]}
     
     try:
-        response = ""
-        async for chunk in chain.astream({"query": query, "context": context}):
-            response += chunk
-        if response:
-            cache.cache_response(query, response)
-        return {**state, "response": [response]}
+        messages = [
+            SystemMessage(SYSTEM_PROMPT.format(context=context)),
+            *(HISTORY_MESSAGES[m["role"]](m["content"]) for m in history if m.get("role") in HISTORY_MESSAGES),
+            HumanMessage(query),
+        ]
+        parts = []
+        async for chunk in get_chat_model().astream(messages):
+            text = _chunk_text(chunk.content)
+            if text:
+                parts.append(text)
+                writer(text)
+        response = "".join(parts)
+        if response and cacheable:
+            await cache.cache_response(query, response)
+            if embedding:
+                await cache.cache_semantic_response(query, embedding, response)
+        return {"response": [response]}
     except Exception as e:
         logger.error(f"Generation: {e}")
-        return {**state, "response": ["I apologize, I'm having trouble connecting. If you are in distress, please call the KIRAN Helpline at 1800-599-0019."]}
+        return {"response": [FALLBACK_RESPONSE]}
 
 
-def should_end_early(state: PipelineState) -> str:
+def should_end_early(state: GraphState) -> str:
     return "end" if state.get("safety_triggered") else "continue"
 
 
 def build_pipeline() -> StateGraph:
-    workflow = StateGraph(PipelineState)
+    workflow = StateGraph(GraphState)
     workflow.add_node("safety", safety_check)
     workflow.add_node("retrieve", retrieve_context)
     workflow.add_node("generate", generate_response)
@@ -1,38 +1,53 @@
 """Pydantic Models"""
-from typing import Optional, List, Annotated
-from pydantic import BaseModel, Field
+from typing import Optional, List, Literal, Annotated, TypedDict
+from pydantic import BaseModel, ConfigDict, Field
 import operator
 
 
 class ChatRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     query: str = Field(..., min_length=1, max_length=5000)
     session_id: Optional[str] = None
 
 
+class HistoryMessage(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    role: Literal["user", "assistant"]
+    content: str = Field(..., max_length=5000)
+
+
 class ChatStreamRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     query: str = Field(..., min_length=1, max_length=5000)
     session_id: Optional[str] = None
-    history: Optional[List[dict]] = None
+    history: Optional[List[HistoryMessage]] = Field(default=None, max_length=50)
 
 
 class ChatResponse(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     response: str
     session_id: str
     sources: List[str] = []
 
 
 class HealthResponse(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     status: str
     neo4j: bool = False
     weaviate: bool = False
     redis: bool = False
 
 
-class GraphState(dict):
-    query: str = ""
-    context: str = ""
-    history: List[dict] = []
-    response: Annotated[List[str], operator.add] = []
-    sources: List[str] = []
-    safety_triggered: bool = False
-    risk_level: Optional[str] = None
+class GraphState(TypedDict, total=False):
+    query: str
+    history: List[dict]
+    safety_triggered: bool
+    context_blocks: Annotated[List[str], operator.add]
+    sources: List[str]
+    response: List[str]
+    topics: List[str]
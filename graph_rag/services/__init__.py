@@ -1,7 +1,7 @@
 """Services"""
-from graph_rag.services.llm import get_chat_model, get_embedding_model
+from graph_rag.services.llm import get_chat_model, get_embedding_model, embed_batcher, EmbeddingBatcher
 from graph_rag.services.cache import cache, CacheService
 from graph_rag.services.vectorstore import vectorstore, VectorStore
 from graph_rag.services.graphdb import graphdb, GraphDB
 
-__all__ = ["get_chat_model", "get_embedding_model", "cache", "CacheService", "vectorstore", "VectorStore", "graphdb", "GraphDB"]
+__all__ = ["get_chat_model", "get_embedding_model", "embed_batcher", "EmbeddingBatcher", "cache", "CacheService", "vectorstore", "VectorStore", "graphdb", "GraphDB"]
@@ -1,99 +1,297 @@
 """Redis Cache Service"""
-import json
-import hashlib
+import asyncio
+import time
 import logging
-from typing import Optional
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Optional
 from datetime import datetime
-import redis
+import numpy as np
+import orjson
+import redis.asyncio as aioredis
+import xxhash
 
 from graph_rag.config import settings
 
 logger = logging.getLogger(__name__)
 
+MAX_HISTORY = settings.max_history
+SESSION_TTL_SECONDS = settings.session_ttl_hours * 3600
+RESPONSE_TTL_SECONDS = 1800
+EMBEDDING_TTL_SECONDS = 86400
+SEARCH_TTL_SECONDS = 300
+
+# Semantic cache: 4 tables of 16-bit random-projection signatures, newest 32 entries kept per bucket
+SEMANTIC_TABLES, SEMANTIC_BITS, SEMANTIC_BUCKET_SIZE = 4, 16, 32
+_BIT_WEIGHTS = 1 << np.arange(SEMANTIC_BITS, dtype=np.int64)
+
+
+def _normalize(text: str) -> str:
+    return text.strip().lower()
+
+
+def _digest(text: str) -> str:
+    return xxhash.xxh3_64_hexdigest(_normalize(text).encode())[:12]
+
+
+@lru_cache(maxsize=4)
+def _projection(dim: int) -> np.ndarray:
+    # Fixed seed so every worker hashes a query into the same buckets
+    return np.random.default_rng(20240229).standard_normal((SEMANTIC_TABLES * SEMANTIC_BITS, dim)).astype(np.float32)
+
+
+def _unit(vector: list) -> np.ndarray:
+    v = vector.astype(np.float32, copy=False) if isinstance(vector, np.ndarray) else np.fromiter(vector, dtype=np.float32, count=len(vector))
+    return v / (np.sqrt(v @ v) or 1.0)
+
+
+def _quantize(v: np.ndarray) -> bytes:
+    # Symmetric int8 with one float32 scale per vector: scale || int8[dim]
+    scale = np.float32(np.abs(v).max() / 127 or 1.0)
+    return scale.tobytes() + np.round(v / scale).astype(np.int8).tobytes()
+
+
+def _dequantize(blobs: list) -> np.ndarray:
+    scales = np.array([np.frombuffer(b, dtype=np.float32, count=1)[0] for b in blobs], dtype=np.float32)
+    return np.stack([np.frombuffer(b, dtype=np.int8, offset=4) for b in blobs]).astype(np.float32) * scales[:, None]
+
+
+def _lsh_buckets(v: np.ndarray) -> list:
+    bits = (_projection(v.shape[0]) @ v > 0).reshape(SEMANTIC_TABLES, SEMANTIC_BITS)
+    return (bits @ _BIT_WEIGHTS).tolist()
+
+
+class LocalLRU:
+    """Small thread-safe in-process LRU with TTL, used as an L1 in front of Redis."""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
 
 class CacheService:
-    _pool = None
+    _redis: Optional[aioredis.Redis] = None
+    _redis_binary: Optional[aioredis.Redis] = None
+    _local_llm = LocalLRU(maxsize=1024, ttl=300)
+    _local_embed = LocalLRU(maxsize=256, ttl=300)
     
     @classmethod
-    def _get_pool(cls):
-        if cls._pool is None:
-            cls._pool = redis.ConnectionPool.from_url(settings.redis_url, decode_responses=True, max_connections=20)
-        return cls._pool
+    def connect(cls) -> None:
+        if cls._redis is None:
+            cls._redis = aioredis.Redis.from_url(settings.redis_url, decode_responses=True, max_connections=settings.redis_pool_size)
+        if cls._redis_binary is None:
+            cls._redis_binary = aioredis.Redis.from_url(settings.redis_url, max_connections=settings.redis_pool_size)
     
     @classmethod
-    def _client(cls):
-        return redis.Redis(connection_pool=cls._get_pool())
+    async def close(cls):
+        for client in (cls._redis, cls._redis_binary):
+            if client:
+                await client.aclose()
+        cls._redis = cls._redis_binary = None
     
     @classmethod
-    def ping(cls) -> bool:
+    def _client(cls) -> aioredis.Redis:
+        if cls._redis is None:
+            cls.connect()
+        return cls._redis
+    
+    @classmethod
+    def _binary_client(cls) -> aioredis.Redis:
+        if cls._redis_binary is None:
+            cls.connect()
+        return cls._redis_binary
+    
+    @classmethod
+    async def warm(cls) -> bool:
+        """Open one pooled connection on each client so the first request skips the TCP/AUTH handshake."""
         try:
-            return cls._client().ping()
+            await asyncio.gather(cls._client().ping(), cls._binary_client().ping())
+            return True
         except:
             return False
     
     @classmethod
-    def get(cls, key: str) -> Optional[str]:
+    async def ping(cls) -> bool:
         try:
-            return cls._client().get(key)
+            return await cls._client().ping()
+        except:
+            return False
+    
+    @classmethod
+    async def get(cls, key: str, ttl: Optional[int] = None) -> Optional[str]:
+        try:
+            return await (cls._client().getex(key, ex=ttl) if ttl else cls._client().get(key))
         except:
             return None
     
     @classmethod
-    def set(cls, key: str, value: str, ttl: int = 3600) -> bool:
+    async def set(cls, key: str, value: str, ttl: int = 3600) -> bool:
         try:
-            cls._client().set(key, value, ex=ttl)
+            await cls._client().set(key, value, ex=ttl)
             return True
         except:
             return False
     
+    @staticmethod
+    def _llm_key(q: str) -> str:
+        return f"llm2:{_digest(q)}"
+    
+    @classmethod
+    async def get_cached_response(cls, q: str) -> Optional[str]:
+        key = cls._llm_key(q)
+        r = cls._local_llm.get(key)
+        if r is None:
+            r = await cls.get(key, RESPONSE_TTL_SECONDS)
+            if r is not None:
+                cls._local_llm.set(key, r)
+        return r
+    
+    @classmethod
+    async def cache_response(cls, q: str, r: str, ttl: int = RESPONSE_TTL_SECONDS) -> bool:
+        key = cls._llm_key(q)
+        cls._local_llm.set(key, r)
+        return await cls.set(key, r, ttl)
+    
     @classmethod
-    def _llm_key(cls, q: str) -> str:
-        return f"llm:{hashlib.md5(q.encode()).hexdigest()[:12]}"
+    async def get_semantic_cached_response(cls, embedding: list) -> Optional[str]:
+        """Return a cached reply whose query embedding is within the cosine threshold, if any."""
+        try:
+            v = _unit(embedding)
+            c = cls._binary_client()
+            async with c.pipeline(transaction=False) as pipe:
+                for table, bucket in enumerate(_lsh_buckets(v)):
+                    pipe.zrange(f"sem2:{table}:{bucket}", 0, -1)
+                keys = list(set(chain.from_iterable(await pipe.execute())))
+            if not keys:
+                return None
+            async with c.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hmget(key, "v", "r")
+                entries = [e for e in await pipe.execute() if e[0] and e[1]]
+            if not entries:
+                return None
+            scores = _dequantize([e[0] for e in entries]) @ v
+            best = int(scores.argmax())
+            return entries[best][1].decode() if scores[best] >= settings.semantic_cache_threshold else None
+        except:
+            return None
     
     @classmethod
-    def get_cached_response(cls, q: str) -> Optional[str]:
-        return cls.get(cls._llm_key(q))
+    async def cache_semantic_response(cls, q: str, embedding: list, r: str, ttl: int = RESPONSE_TTL_SECONDS) -> bool:
+        try:
+            v = _unit(embedding)
+            key = f"sem2:e:{_digest(q)}"
+            now = time.time()
+            async with cls._binary_client().pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping={"v": _quantize(v), "r": r})
+                pipe.expire(key, ttl)
+                for table, bucket in enumerate(_lsh_buckets(v)):
+                    bucket_key = f"sem2:{table}:{bucket}"
+                    pipe.zadd(bucket_key, {key: now})
+                    pipe.zremrangebyrank(bucket_key, 0, -SEMANTIC_BUCKET_SIZE - 1)
+                    pipe.expire(bucket_key, ttl)
+                await pipe.execute()
+            return True
+        except:
+            return False
+    
+    @staticmethod
+    def _embed_key(t: str) -> str:
+        return f"emb3:{_digest(t)}"
     
     @classmethod
-    def cache_response(cls, q: str, r: str, ttl: int = 1800) -> bool:
-        return cls.set(cls._llm_key(q), r, ttl)
+    async def get_cached_embedding(cls, t: str) -> Optional[list]:
+        key = cls._embed_key(t)
+        e = cls._local_embed.get(key)
+        if e is None:
+            try:
+                d = await cls._binary_client().getex(key, ex=EMBEDDING_TTL_SECONDS)
+            except:
+                d = None
+            if d:
+                e = np.frombuffer(d, dtype=np.float16).astype(np.float32).tolist()
+                cls._local_embed.set(key, e)
+        return e
     
     @classmethod
-    def _embed_key(cls, t: str) -> str:
-        return f"emb:{hashlib.md5(t.encode()).hexdigest()[:12]}"
+    async def cache_embedding(cls, t: str, e: list, ttl: int = EMBEDDING_TTL_SECONDS) -> bool:
+        key = cls._embed_key(t)
+        cls._local_embed.set(key, e)
+        try:
+            await cls._binary_client().set(key, np.asarray(e, dtype=np.float16).tobytes(), ex=ttl)
+            return True
+        except:
+            return False
+    
+    @staticmethod
+    def _search_key(q: str, top_k: int) -> str:
+        return f"vs1:{_digest(q)}:{top_k}"
     
     @classmethod
-    def get_cached_embedding(cls, t: str) -> Optional[list]:
-        d = cls.get(cls._embed_key(t))
-        return json.loads(d) if d else None
+    async def get_cached_search(cls, q: str, top_k: int) -> Optional[list]:
+        try:
+            d = await cls._binary_client().get(cls._search_key(q, top_k))
+        except:
+            return None
+        return orjson.loads(d) if d else None
     
     @classmethod
-    def cache_embedding(cls, t: str, e: list, ttl: int = 86400) -> bool:
-        return cls.set(cls._embed_key(t), json.dumps(e), ttl)
+    async def cache_search(cls, q: str, top_k: int, results: list, ttl: int = SEARCH_TTL_SECONDS) -> bool:
+        try:
+            await cls._binary_client().set(cls._search_key(q, top_k), orjson.dumps(results), ex=ttl)
+            return True
+        except:
+            return False
     
     @classmethod
-    def add_message(cls, sid: str, role: str, content: str) -> bool:
+    async def add_message(cls, sid: str, role: str, content: str) -> bool:
         try:
-            c = cls._client()
             key = f"history:{sid}"
-            c.rpush(key, json.dumps({"role": role, "content": content, "ts": datetime.utcnow().isoformat()}))
-            c.ltrim(key, -settings.max_history, -1)
-            c.expire(key, settings.session_ttl_hours * 3600)
+            msg = orjson.dumps({"role": role, "content": content, "ts": datetime.utcnow()})
+            async with cls._binary_client().pipeline(transaction=False) as pipe:
+                pipe.rpush(key, msg).ltrim(key, -MAX_HISTORY, -1).expire(key, SESSION_TTL_SECONDS)
+                await pipe.execute()
             return True
         except:
             return False
     
     @classmethod
-    def get_history(cls, sid: str, limit: int = 20) -> list:
+    async def get_history(cls, sid: str, limit: int = 20) -> list:
         try:
-            return [json.loads(m) for m in cls._client().lrange(f"history:{sid}", -limit, -1)]
+            return [orjson.loads(m) for m in await cls._binary_client().lrange(f"history:{sid}", -limit, -1)]
         except:
             return []
     
     @classmethod
-    def clear_history(cls, sid: str) -> bool:
+    async def clear_history(cls, sid: str) -> bool:
         try:
-            cls._client().delete(f"history:{sid}")
+            await cls._client().delete(f"history:{sid}")
             return True
         except:
             return False
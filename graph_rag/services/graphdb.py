@@ -27,19 +27,24 @@ class GraphDB:
     @classmethod
     async def execute(cls, query: str, params: dict = None) -> list:
         driver = await cls.connect()
-        async with driver.session() as session:
-            result = await session.run(query, params or {})
-            return [dict(record) async for record in result]
+        records, _, _ = await driver.execute_query(query, params or {}, database_=settings.neo4j_database)
+        return [record.data() for record in records]
     
     @classmethod
     async def get_related_entities(cls, entity: str, hops: int = 2) -> list:
         query = """
         MATCH path = (e:Entity)-[*1..2]-(related)
-        WHERE toLower(e.name) CONTAINS toLower($entity)
+        WHERE e.name_lc CONTAINS $entity
         RETURN e.name AS source, [r IN relationships(path) | type(r)] AS rels, related.name AS target
         LIMIT 20
         """
-        return await cls.execute(query, {"entity": entity})
+        return await cls.execute(query, {"entity": entity.lower()})
+    
+    @classmethod
+    async def ensure_schema(cls):
+        await cls.execute("CREATE TEXT INDEX entity_name_lc IF NOT EXISTS FOR (e:Entity) ON (e.name_lc)")
+        # Backfill entities written before name_lc existed
+        await cls.execute("MATCH (e:Entity) WHERE e.name_lc IS NULL SET e.name_lc = toLower(e.name)")
     
     @classmethod
     async def health_check(cls) -> bool:
@@ -1,20 +1,36 @@
 """LLM Service"""
+import asyncio
 import logging
 from functools import lru_cache
 from langchain_core.language_models import BaseChatModel
 from langchain_core.embeddings import Embeddings
-from langchain_aws import ChatBedrock, BedrockEmbeddings
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 from graph_rag.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache
+def _bedrock_client():
+    import boto3
+    from botocore.config import Config
+    config = Config(max_pool_connections=settings.llm_pool_size, retries={"mode": "adaptive"})
+    return boto3.client("bedrock-runtime", region_name=settings.aws_region, config=config)
+
+
+@lru_cache
+def _openai_http_clients():
+    import httpx
+    limits = httpx.Limits(max_connections=settings.llm_pool_size * 2, max_keepalive_connections=settings.llm_pool_size)
+    return httpx.Client(limits=limits, timeout=30), httpx.AsyncClient(limits=limits, timeout=30)
+
+
 @lru_cache
 def get_chat_model() -> BaseChatModel:
     if settings.model_provider == "aws_bedrock":
+        from langchain_aws import ChatBedrock
         return ChatBedrock(
+            client=_bedrock_client(),
             model_id=settings.llm_model_id,
             model_kwargs={"temperature": 0.1},
             streaming=True,
@@ -23,8 +39,12 @@ def get_chat_model() -> BaseChatModel:
     elif settings.model_provider == "openai":
         if not settings.openai_api_key:
             raise ValueError("OPENAI_API_KEY required")
+        from langchain_openai import ChatOpenAI
+        http_client, http_async_client = _openai_http_clients()
         return ChatOpenAI(
             api_key=settings.openai_api_key,
+            http_client=http_client,
+            http_async_client=http_async_client,
             model=settings.llm_model_id,
             temperature=0,
             streaming=True
@@ -35,9 +55,73 @@ def get_chat_model() -> BaseChatModel:
 @lru_cache
 def get_embedding_model() -> Embeddings:
     if settings.model_provider == "aws_bedrock":
-        return BedrockEmbeddings(model_id=settings.embedding_model_id, region_name=settings.aws_region)
+        from langchain_aws import BedrockEmbeddings
+        return BedrockEmbeddings(client=_bedrock_client(), model_id=settings.embedding_model_id, region_name=settings.aws_region)
     elif settings.model_provider == "openai":
         if not settings.openai_api_key:
             raise ValueError("OPENAI_API_KEY required")
-        return OpenAIEmbeddings(api_key=settings.openai_api_key, model=settings.embedding_model_id)
+        from langchain_openai import OpenAIEmbeddings
+        http_client, http_async_client = _openai_http_clients()
+        return OpenAIEmbeddings(
+            api_key=settings.openai_api_key,
+            model=settings.embedding_model_id,
+            http_client=http_client,
+            http_async_client=http_async_client
+        )
     raise ValueError(f"Unknown provider: {settings.model_provider}")
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent query embeddings into one embed_documents call."""
+    
+    def __init__(self, max_batch: int = 16, linger: float = 0.01):
+        self.max_batch, self.linger = max_batch, linger
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+    
+    async def embed(self, text: str) -> list[float]:
+        if self.max_batch == 1:
+            return await asyncio.to_thread(get_embedding_model().embed_query, text)
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        # Identical in-flight queries share one slot in the batch
+        self._pending.setdefault(text, []).append(fut)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.linger, self._flush)
+        return await fut
+    
+    def _flush(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, batch: dict[str, list[asyncio.Future]]) -> None:
+        texts, model = list(batch), get_embedding_model()
+        try:
+            # Asymmetric embedders (e.g. Cohere) encode queries differently
+            if len(texts) == 1:
+                vectors = [await asyncio.to_thread(model.embed_query, texts[0])]
+            else:
+                vectors = await asyncio.to_thread(model.embed_documents, texts)
+        except Exception as e:
+            for futs in batch.values():
+                for f in futs:
+                    if not f.done():
+                        f.set_exception(e)
+            return
+        for futs, vector in zip(batch.values(), vectors):
+            for f in futs:
+                if not f.done():
+                    f.set_result(vector)
+
+
+# BedrockEmbeddings sends one request per text, so there is nothing to batch
+embed_batcher = EmbeddingBatcher(max_batch=settings.embed_batch_size if settings.model_provider == "openai" else 1)
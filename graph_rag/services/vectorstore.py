@@ -1,36 +1,77 @@
 """Weaviate Vector Store"""
 import logging
+import threading
 from typing import Optional
+import grpc
 import weaviate
-from weaviate.classes.config import Configure, Property, DataType
+from weaviate.collections import Collection
+from weaviate.exceptions import WeaviateClosedClientError, WeaviateConnectionError, WeaviateGRPCUnavailableError
+from weaviate.classes.config import Configure, Property, DataType, VectorDistances
 
 from graph_rag.config import settings
 
 logger = logging.getLogger(__name__)
 
+_CONNECTION_ERRORS = (WeaviateConnectionError, WeaviateClosedClientError, WeaviateGRPCUnavailableError)
+
+
+def _is_connection_error(e: BaseException) -> bool:
+    # Query errors wrap the underlying gRPC failure
+    seen = set()
+    while e is not None and id(e) not in seen:
+        seen.add(id(e))
+        if isinstance(e, _CONNECTION_ERRORS):
+            return True
+        if isinstance(e, grpc.RpcError) and getattr(e, "code", lambda: None)() == grpc.StatusCode.UNAVAILABLE:
+            return True
+        e = e.__cause__ or e.__context__
+    return False
+
 
 class VectorStore:
     _client: Optional[weaviate.WeaviateClient] = None
+    _collection: Optional[Collection] = None
+    _lock = threading.Lock()
     
     @classmethod
     def connect(cls) -> weaviate.WeaviateClient:
-        if cls._client is None:
-            url = settings.weaviate_url.replace("http://", "")
-            host, port = url.split(":") if ":" in url else (url, "8080")
-            cls._client = weaviate.connect_to_local(host=host, port=int(port), grpc_port=50051)
-            cls._ensure_collection()
-            logger.info("Weaviate connected")
-        return cls._client
+        return cls._handles()[0]
+    
+    @classmethod
+    def _handles(cls) -> tuple:
+        with cls._lock:
+            if cls._client is None:
+                url = settings.weaviate_url.replace("http://", "")
+                host, port = url.split(":") if ":" in url else (url, "8080")
+                client = weaviate.connect_to_local(host=host, port=int(port), grpc_port=50051)
+                try:
+                    cls._ensure_collection(client)
+                    cls._collection = client.collections.get(settings.weaviate_class)
+                except Exception:
+                    client.close()
+                    raise
+                cls._client = client
+                logger.info("Weaviate connected")
+            return cls._client, cls._collection
     
     @classmethod
-    def _ensure_collection(cls):
+    def _ensure_collection(cls, client: weaviate.WeaviateClient):
         name = settings.weaviate_class
         try:
-            if not cls._client.collections.exists(name):
+            if not client.collections.exists(name):
                 logger.info(f"Creating collection: {name}")
-                cls._client.collections.create(
+                client.collections.create(
                     name=name,
                     vectorizer_config=Configure.Vectorizer.none(),
+                    vector_index_config=Configure.VectorIndex.hnsw(
+                        distance_metric=VectorDistances.COSINE,
+                        max_connections=24,
+                        ef_construction=400,
+                        ef=-1,
+                        dynamic_ef_factor=4,
+                        dynamic_ef_min=64,
+                        quantizer=Configure.VectorIndex.Quantizer.sq() if settings.weaviate_scalar_quantization else None,
+                    ),
                     properties=[
                         Property(name="chunk_id", data_type=DataType.TEXT),
                         Property(name="content", data_type=DataType.TEXT),
@@ -41,25 +82,65 @@ class VectorStore:
             if "already exists" not in str(e).lower():
                 raise
     
+    @classmethod
+    def collection(cls) -> Collection:
+        return cls._handles()[1]
+    
     @classmethod
     def insert(cls, vectors: list, chunk_ids: list, contents: list, doc_id: str = "") -> int:
+        if not len(vectors) == len(chunk_ids) == len(contents):
+            raise ValueError(f"Mismatched insert: {len(vectors)} vectors, {len(chunk_ids)} ids, {len(contents)} contents")
+        # failed_objects lives on the handle, so concurrent inserts each need their own
         collection = cls.connect().collections.get(settings.weaviate_class)
-        with collection.batch.dynamic() as batch:
+        with collection.batch.fixed_size(batch_size=settings.weaviate_batch_size, concurrent_requests=settings.weaviate_batch_concurrency) as batch:
             for vec, cid, content in zip(vectors, chunk_ids, contents):
                 batch.add_object(vector=vec, properties={"chunk_id": cid, "content": content, "doc_id": doc_id})
-        return len(vectors)
+        failed = collection.batch.failed_objects
+        if failed:
+            logger.error(f"Weaviate rejected {len(failed)}/{len(vectors)} objects: {failed[0].message}")
+        return len(vectors) - len(failed)
     
     @classmethod
     def search(cls, query_vector: list, top_k: int = 5) -> list:
-        collection = cls.connect().collections.get(settings.weaviate_class)
-        result = collection.query.near_vector(near_vector=query_vector, limit=top_k, return_properties=["chunk_id", "content", "doc_id"])
+        client, collection = cls._handles()
+        try:
+            result = cls._near_vector(collection, query_vector, top_k)
+        except Exception as e:
+            if not _is_connection_error(e):
+                raise
+            logger.warning(f"Weaviate connection lost, reconnecting: {e}")
+            cls._discard(client)
+            result = cls._near_vector(cls.collection(), query_vector, top_k)
+        # Weaviate omits unset properties
         return [{"chunk_id": o.properties.get("chunk_id", ""), "content": o.properties.get("content", ""), "doc_id": o.properties.get("doc_id", "")} for o in result.objects]
     
+    @staticmethod
+    def _near_vector(collection: Collection, query_vector: list, top_k: int):
+        return collection.query.near_vector(near_vector=query_vector, limit=top_k, return_properties=["chunk_id", "content", "doc_id"])
+    
+    @classmethod
+    def health_check(cls) -> bool:
+        try:
+            return cls.connect().is_ready()
+        except:
+            return False
+    
+    @classmethod
+    def _discard(cls, client: weaviate.WeaviateClient):
+        with cls._lock:
+            if cls._client is not client:
+                return
+            cls._client, cls._collection = None, None
+        try:
+            client.close()
+        except Exception as e:
+            logger.warning(f"Weaviate close failed: {e}")
+    
     @classmethod
     def close(cls):
-        if cls._client:
-            cls._client.close()
-            cls._client = None
-
+        with cls._lock:
+            client, cls._client, cls._collection = cls._client, None, None
+        if client:
+            client.close()
 
 vectorstore = VectorStore
@@ -7,3 +7,7 @@ bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:80")
 worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker")
 timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
 keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+# Import the app (LangChain, Weaviate, Neo4j clients, compiled pipeline) once in the master and fork
+# workers from it, instead of paying the heavy imports again in every worker. Connections are opened
+# in the FastAPI lifespan, which runs per worker after the fork.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
@@ -1,12 +1,17 @@
 """GraphRAG API Server"""
+import asyncio
 import logging
-import uuid
+import queue
+import secrets
 import os
+from itertools import chain
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
+import orjson
 from fastapi import FastAPI, HTTPException, Request, UploadFile, File
-from fastapi.responses import StreamingResponse, JSONResponse
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse, ORJSONResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
@@ -14,16 +19,55 @@ from slowapi.errors import RateLimitExceeded
 from graph_rag.config import settings
 from graph_rag.models import ChatRequest, ChatStreamRequest, HealthResponse
 from graph_rag.core import pipeline
-from graph_rag.services import cache, vectorstore, graphdb, get_embedding_model
+from graph_rag.services import cache, vectorstore, graphdb, get_chat_model, get_embedding_model
 
-logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+logging.getLogger().setLevel(logging.WARNING)
 logging.getLogger("graph_rag").setLevel(logging.INFO)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
+HISTORY_TURNS = 10
+
+# Coalesce streamed deltas into one write per 8 chunks or 20ms, whichever comes first
+STREAM_FLUSH_CHUNKS = 8
+STREAM_FLUSH_SECONDS = 0.02
+
+UPLOAD_EMBED_BATCH = 64
+UPLOAD_EMBED_CONCURRENCY = 4
+_upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_EMBED_CONCURRENCY, thread_name_prefix="upload-embed")
+UPLOAD_COPY_CHUNK = 1 << 20
+
+
+# `python main.py` imports this module twice, so only the first call installs the handler
+def _start_log_listener() -> QueueListener:
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, QueueHandler) and getattr(handler, "listener", None):
+            return handler.listener
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+    handler = QueueHandler(log_queue)
+    handler.listener = QueueListener(log_queue, stream)
+    handler.listener.start()
+    root.addHandler(handler)
+    return handler.listener
+
+
+def _stop_log_listener() -> None:
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, QueueHandler) and getattr(h, "listener", None)]:
+        root.removeHandler(handler)
+        handler.listener.stop()
+
+
+HEALTH_BODY = orjson.dumps({"status": "ok"})
+CLEARED_BODY = orjson.dumps({"status": "cleared"})
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    _start_log_listener()
     logger.info("Starting API...")
     try:
         vectorstore.connect()
@@ -33,15 +77,63 @@ async def lifespan(app: FastAPI):
         await graphdb.connect()
     except Exception as e:
         logger.error(f"Neo4j failed: {e}")
+    try:
+        await graphdb.ensure_schema()
+    except Exception as e:
+        logger.error(f"Neo4j schema setup failed: {e}")
+    try:
+        get_chat_model(), get_embedding_model()
+    except Exception as e:
+        logger.error(f"Model init failed: {e}")
+    cache.connect()
+    if not await cache.warm():
+        logger.error("Redis unreachable")
     os.makedirs(settings.upload_dir, exist_ok=True)
     yield
     vectorstore.close()
     await graphdb.close()
+    await cache.close()
+    _stop_log_listener()
+
+
+class AllowAllCORSMiddleware:
+    """Wildcard CORS with precomputed headers: preflights get a fixed 204, other cross-origin requests one extra header."""
+    ALLOW_ORIGIN = (b"access-control-allow-origin", b"*")
+    PREFLIGHT_HEADERS = [
+        ALLOW_ORIGIN,
+        (b"access-control-allow-methods", b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"),
+        (b"access-control-max-age", b"600"),
+    ]
 
+    def __init__(self, app):
+        self.app = app
 
-app = FastAPI(title="GraphRAG API", version="1.0.0", lifespan=lifespan)
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        if b"origin" not in headers:
+            return await self.app(scope, receive, send)
+        if scope["method"] == "OPTIONS":
+            if b"access-control-request-method" in headers:
+                response_headers = self.PREFLIGHT_HEADERS
+                if b"access-control-request-headers" in headers:
+                    response_headers = [*response_headers, (b"access-control-allow-headers", headers[b"access-control-request-headers"])]
+                await send({"type": "http.response.start", "status": 204, "headers": response_headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
 
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), self.ALLOW_ORIGIN]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+app = FastAPI(title="GraphRAG API", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+app.add_middleware(AllowAllCORSMiddleware)
 
 limiter = Limiter(key_func=get_remote_address, default_limits=[settings.rate_limit])
 app.state.limiter = limiter
@@ -49,105 +141,171 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 
 @app.get("/health")
-def health():
-    return {"status": "ok"}
+async def health():
+    return Response(content=HEALTH_BODY, media_type="application/json")
 
 
 @app.get("/ready", response_model=HealthResponse)
 async def ready():
-    neo4j_ok = await graphdb.health_check()
-    return HealthResponse(status="ready" if neo4j_ok else "degraded", neo4j=neo4j_ok, weaviate=True, redis=cache.ping())
+    neo4j_ok, weaviate_ok, redis_ok = await asyncio.gather(graphdb.health_check(), asyncio.to_thread(vectorstore.health_check), cache.ping())
+    return HealthResponse(status="ready" if neo4j_ok and weaviate_ok else "degraded", neo4j=neo4j_ok, weaviate=weaviate_ok, redis=redis_ok)
 
 
 @app.post("/chat")
 @limiter.limit(settings.rate_limit)
 async def chat(request: ChatRequest, req: Request):
-    session_id = request.session_id or str(uuid.uuid4())
-    cache.add_message(session_id, "user", request.query)
+    session_id = request.session_id or secrets.token_hex(16)
+    history = await cache.get_history(session_id, HISTORY_TURNS)
+    await cache.add_message(session_id, "user", request.query)
     
-    result = await pipeline.ainvoke({
-        "query": request.query,
-        "history": cache.get_history(session_id, limit=10)
-    })
+    result = await pipeline.ainvoke({"query": request.query, "history": history})
     
     response = result.get("response", [""])[0]
-    cache.add_message(session_id, "assistant", response)
-    return {"response": response, "session_id": session_id}
+    await cache.add_message(session_id, "assistant", response)
+    return ORJSONResponse({"response": response, "session_id": session_id})
 
 
 @app.post("/chat/stream")
 @limiter.limit(settings.rate_limit)
 async def chat_stream(request: ChatStreamRequest, req: Request):
-    session_id = request.session_id or str(uuid.uuid4())
-    cache.add_message(session_id, "user", request.query)
+    session_id = request.session_id or secrets.token_hex(16)
+    if request.history is not None:
+        history = [m.model_dump() for m in request.history[-HISTORY_TURNS:]]
+    else:
+        history = await cache.get_history(session_id, HISTORY_TURNS)
+    await cache.add_message(session_id, "user", request.query)
     
     async def generate():
-        full_response = ""
+        loop = asyncio.get_running_loop()
+        streamed, buf, last_flush = [], [], loop.time()
         try:
-            async for chunk in pipeline.astream({"query": request.query, "history": request.history or []}):
-                if "response" in chunk and chunk["response"]:
-                    new_text = chunk["response"][-1]
-                    if len(new_text) > len(full_response):
-                        yield new_text[len(full_response):]
-                        full_response = new_text
-            cache.add_message(session_id, "assistant", full_response)
+            # "custom" carries LLM tokens; "updates" carries whole replies from nodes that never reach the LLM
+            async for mode, payload in pipeline.astream(
+                {"query": request.query, "history": history}, stream_mode=["custom", "updates"]
+            ):
+                if mode == "custom":
+                    delta = payload
+                else:
+                    update = next(iter(payload.values()), None)
+                    if not update or not update.get("response"):
+                        continue
+                    final = update["response"][-1]
+                    if not streamed:
+                        delta = final
+                    elif final != "".join(streamed):
+                        # Generation failed mid-stream
+                        delta = "\n\n" + final
+                    else:
+                        continue
+                streamed.append(delta)
+                buf.append(delta)
+                if len(buf) >= STREAM_FLUSH_CHUNKS or loop.time() - last_flush >= STREAM_FLUSH_SECONDS:
+                    yield "".join(buf)
+                    buf.clear()
+                    last_flush = loop.time()
+            if buf:
+                yield "".join(buf)
+            await cache.add_message(session_id, "assistant", "".join(streamed))
         except Exception as e:
             logger.error(f"Stream error: {e}")
-            yield "\n\n[Error]"
+            yield "".join(buf) + "\n\n[Error]"
     
     return StreamingResponse(generate(), media_type="text/plain", headers={"X-Accel-Buffering": "no"})
 
 
+def _save_upload(src, filepath: Path, max_bytes: int) -> bool:
+    size = 0
+    with filepath.open("wb") as dst:
+        while chunk := src.read(UPLOAD_COPY_CHUNK):
+            size += len(chunk)
+            if size > max_bytes:
+                break
+            dst.write(chunk)
+    if size > max_bytes:
+        filepath.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def _extract_pdf_text(filepath: Path) -> str:
+    # pymupdf is much faster but AGPL, so it stays optional
+    try:
+        import pymupdf
+    except ImportError:
+        from pypdf import PdfReader
+        return "\n\n".join(p.extract_text() or "" for p in PdfReader(str(filepath)).pages)
+    with pymupdf.open(filepath) as doc:
+        return "\n\n".join(page.get_text() for page in doc)
+
+
 @app.post("/documents/upload")
 async def upload_document(file: UploadFile = File(...)):
     suffix = Path(file.filename).suffix.lower()
     if suffix not in {".pdf", ".txt", ".md"}:
         raise HTTPException(400, f"Unsupported: {suffix}")
     
-    content = await file.read()
-    if len(content) > settings.max_upload_mb * 1024 * 1024:
+    max_bytes = settings.max_upload_mb * 1024 * 1024
+    if file.size is not None and file.size > max_bytes:
         raise HTTPException(400, "File too large")
     
     filepath = Path(settings.upload_dir) / file.filename
-    filepath.write_bytes(content)
+    if not await asyncio.to_thread(_save_upload, file.file, filepath, max_bytes):
+        raise HTTPException(400, "File too large")
     
     try:
         if suffix == ".pdf":
-            from pypdf import PdfReader
-            text = "\n\n".join(p.extract_text() or "" for p in PdfReader(str(filepath)).pages)
+            text = await asyncio.to_thread(_extract_pdf_text, filepath)
         else:
-            text = content.decode("utf-8")
+            text = await asyncio.to_thread(filepath.read_text, encoding="utf-8")
         
         chunks = [text[i:i+1000] for i in range(0, len(text), 900)]
-        embeddings = get_embedding_model().embed_documents(chunks)
-        doc_id = str(uuid.uuid4())[:8]
-        vectorstore.insert(embeddings, [f"{doc_id}_{i}" for i in range(len(chunks))], chunks, doc_id)
+        embed_model, loop = get_embedding_model(), asyncio.get_running_loop()
+        batches = await asyncio.gather(*(
+            loop.run_in_executor(_upload_executor, embed_model.embed_documents, chunks[i:i + UPLOAD_EMBED_BATCH])
+            for i in range(0, len(chunks), UPLOAD_EMBED_BATCH)
+        ))
+        embeddings = list(chain.from_iterable(batches))
+        doc_id = secrets.token_hex(4)
+        await asyncio.to_thread(vectorstore.insert, embeddings, [f"{doc_id}_{i}" for i in range(len(chunks))], chunks, doc_id)
         
-        return {"doc_id": doc_id, "filename": file.filename, "chunks": len(chunks)}
+        return ORJSONResponse({"doc_id": doc_id, "filename": file.filename, "chunks": len(chunks)})
     except Exception as e:
         logger.error(f"Ingest error: {e}")
         raise HTTPException(500, str(e))
 
 
-@app.get("/documents")
-def list_documents():
+def _list_uploads() -> list:
     upload_dir = Path(settings.upload_dir)
     if not upload_dir.exists():
-        return {"documents": []}
-    return {"documents": [{"filename": f.name, "size": f.stat().st_size} for f in upload_dir.iterdir() if f.suffix.lower() in {".pdf", ".txt", ".md"}]}
+        return []
+    return [{"filename": f.name, "size": f.stat().st_size} for f in upload_dir.iterdir() if f.suffix.lower() in {".pdf", ".txt", ".md"}]
+
+
+@app.get("/documents")
+async def list_documents():
+    return {"documents": await asyncio.to_thread(_list_uploads)}
 
 
 @app.get("/session/{session_id}/history")
-def get_history(session_id: str, limit: int = 20):
-    return {"messages": cache.get_history(session_id, limit)}
+async def get_history(session_id: str, limit: int = 20):
+    return {"messages": await cache.get_history(session_id, limit)}
 
 
 @app.delete("/session/{session_id}")
-def clear_session(session_id: str):
-    cache.clear_history(session_id)
-    return {"status": "cleared"}
+async def clear_session(session_id: str):
+    await cache.clear_history(session_id)
+    return Response(content=CLEARED_BODY, media_type="application/json")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host=settings.api_host, port=settings.api_port)
+    uvicorn.run(
+        "main:app",
+        host=settings.api_host,
+        port=settings.api_port,
+        workers=1 if settings.debug else (settings.api_workers or os.cpu_count()),
+        reload=settings.debug,
+        loop="uvloop",
+        http="httptools",
+        log_level="info",
+    )
@@ -25,11 +25,14 @@ async def ingest_data():
     # 2. Ingest into Neo4j
     logger.info("Ingesting to Neo4j...")
     await graphdb.connect()
+    await graphdb.ensure_schema()
     
     for _, row in df.iterrows():
         query = """
         MERGE (s:Entity {name: $source})
+        SET s.name_lc = toLower($source)
         MERGE (t:Entity {name: $target})
+        SET t.name_lc = toLower($target)
         MERGE (s)-[:RELATIONSHIP {type: $rel}]->(t)
         """
         await graphdb.execute(
@@ -47,13 +50,13 @@ async def ingest_data():
     entities = list(set(df["source"].tolist() + df["target"].tolist()))
     if entities:
         embeddings = get_embedding_model().embed_documents(entities)
-        vectorstore.insert(
+        inserted = vectorstore.insert(
             vectors=embeddings,
             chunk_ids=entities,
             contents=entities,
             doc_id="seed_data"
         )
-        logger.info(f"Inserted {len(entities)} entities to Weaviate")
+        logger.info(f"Inserted {inserted}/{len(entities)} entities to Weaviate")
     
     await graphdb.close()
     vectorstore.close()
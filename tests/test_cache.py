@@ -0,0 +1,35 @@
+"""Cache service tests"""
+from __future__ import annotations
+import numpy as np
+from graph_rag.services.cache import CacheService, LocalLRU, SEMANTIC_TABLES, _dequantize, _lsh_buckets, _quantize, _unit
+
+def test_local_lru_evicts_least_recently_used():
+    lru = LocalLRU(maxsize=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+
+def test_local_lru_expires_entries():
+    lru = LocalLRU(maxsize=2, ttl=-1)
+    lru.set("a", 1)
+    assert lru.get("a") is None
+
+def test_cache_keys_are_normalized():
+    assert CacheService._llm_key("  How do I Sleep? ") == CacheService._llm_key("how do i sleep?")
+    assert CacheService._llm_key("sleep").startswith("llm2:")
+
+def test_lsh_buckets_ignore_vector_scale():
+    v = np.random.default_rng(0).standard_normal(64)
+    buckets = _lsh_buckets(_unit(v))
+    assert len(buckets) == SEMANTIC_TABLES
+    assert buckets == _lsh_buckets(_unit(v * 7.5))
+
+def test_int8_quantization_preserves_cosine():
+    rng = np.random.default_rng(1)
+    v, w = _unit(rng.standard_normal(1024)), _unit(rng.standard_normal(1024))
+    restored = _dequantize([_quantize(v), _quantize(w)])
+    assert abs(restored[0] @ v - 1.0) < 0.01
+    assert abs(restored[1] @ v - w @ v) < 0.01
@@ -0,0 +1,34 @@
+"""LLM service tests"""
+from __future__ import annotations
+import asyncio
+import pytest
+from graph_rag.services import llm
+
+class RecordingEmbeddings:
+    def __init__(self):
+        self.calls = []
+    
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+    
+    def embed_query(self, text):
+        self.calls.append(text)
+        return [float(len(text))]
+
+@pytest.mark.asyncio
+async def test_embedding_batcher_coalesces_concurrent_queries(monkeypatch):
+    model = RecordingEmbeddings()
+    monkeypatch.setattr(llm, "get_embedding_model", lambda: model)
+    batcher = llm.EmbeddingBatcher(max_batch=8, linger=0.01)
+    vectors = await asyncio.gather(batcher.embed("calm"), batcher.embed("sleep"), batcher.embed("calm"))
+    assert vectors == [[4.0], [5.0], [4.0]]
+    assert model.calls == [["calm", "sleep"]]
+
+@pytest.mark.asyncio
+async def test_embedding_batcher_uses_embed_query_for_single_texts(monkeypatch):
+    model = RecordingEmbeddings()
+    monkeypatch.setattr(llm, "get_embedding_model", lambda: model)
+    assert await llm.EmbeddingBatcher(max_batch=8, linger=0.01).embed("calm") == [4.0]
+    assert await llm.EmbeddingBatcher(max_batch=1).embed("sleep") == [5.0]
+    assert model.calls == ["calm", "sleep"]
@@ -0,0 +1,89 @@
+"""API server tests"""
+from __future__ import annotations
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import main
+
+def cors_client() -> TestClient:
+    inner = FastAPI()
+    
+    @inner.get("/ping")
+    async def ping():
+        return {"ok": True}
+    
+    return TestClient(main.AllowAllCORSMiddleware(inner))
+
+def test_cors_preflight_is_answered_directly():
+    response = cors_client().options("/ping", headers={
+        "Origin": "http://localhost:7860",
+        "Access-Control-Request-Method": "POST",
+        "Access-Control-Request-Headers": "content-type",
+    })
+    assert response.status_code == 204
+    assert response.headers["access-control-allow-origin"] == "*"
+    assert "POST" in response.headers["access-control-allow-methods"]
+    assert response.headers["access-control-allow-headers"] == "content-type"
+
+def test_cors_simple_request_gets_allow_origin():
+    response = cors_client().get("/ping", headers={"Origin": "http://localhost:7860"})
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == "*"
+    assert response.json() == {"ok": True}
+
+def test_non_cors_request_passes_through_unchanged():
+    response = cors_client().get("/ping")
+    assert response.status_code == 200
+    assert "access-control-allow-origin" not in response.headers
+    assert response.json() == {"ok": True}
+
+class StubPipeline:
+    def __init__(self, events):
+        self.events = events
+    
+    async def astream(self, state, stream_mode):
+        for event in self.events:
+            yield event
+
+class RecordingCache:
+    def __init__(self):
+        self.messages = []
+    
+    async def get_history(self, session_id, limit):
+        return []
+    
+    async def add_message(self, session_id, role, content):
+        self.messages.append((role, content))
+        return True
+
+def stream_chat(monkeypatch, events):
+    recorder = RecordingCache()
+    monkeypatch.setattr(main, "pipeline", StubPipeline(events))
+    monkeypatch.setattr(main, "cache", recorder)
+    with TestClient(main.app).stream("POST", "/chat/stream", json={"query": "hi", "session_id": "s1"}) as response:
+        body = "".join(response.iter_text())
+    return body, recorder.messages[-1]
+
+def test_stream_appends_fallback_after_partial_output(monkeypatch):
+    body, stored = stream_chat(monkeypatch, [
+        ("custom", "Let us "),
+        ("updates", {"generate": {"response": ["Sorry, something went wrong."]}}),
+    ])
+    assert body == "Let us \n\nSorry, something went wrong."
+    assert stored == ("assistant", body)
+
+def test_stream_sends_cached_reply_when_nothing_streamed(monkeypatch):
+    body, stored = stream_chat(monkeypatch, [
+        ("updates", {"retrieve": {"context_blocks": []}}),
+        ("updates", {"generate": {"response": ["From cache"]}}),
+    ])
+    assert body == "From cache"
+    assert stored == ("assistant", "From cache")
+
+def test_stream_does_not_repeat_a_fully_streamed_reply(monkeypatch):
+    body, stored = stream_chat(monkeypatch, [
+        ("custom", "Breathe "),
+        ("custom", "slowly."),
+        ("updates", {"generate": {"response": ["Breathe slowly."]}}),
+    ])
+    assert body == "Breathe slowly."
+    assert stored == ("assistant", "Breathe slowly.")
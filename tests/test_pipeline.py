@@ -0,0 +1,114 @@
+"""LangGraph pipeline tests"""
+from __future__ import annotations
+import importlib
+import pytest
+from graph_rag.core.pipeline import safety_check
+
+# graph_rag.core re-exports the compiled graph as `pipeline`, shadowing the module attribute
+pipeline_module = importlib.import_module("graph_rag.core.pipeline")
+
+@pytest.mark.asyncio
+async def test_safety_check_safe_query():
+    result = await safety_check({"query": "I had a good day"})
+    assert result["safety_triggered"] is False
+
+@pytest.mark.asyncio
+async def test_safety_check_critical_query_is_case_insensitive():
+    result = await safety_check({"query": "Sometimes I WANT TO DIE"})
+    assert result["safety_triggered"] is True
+    assert "KIRAN" in result["response"][0]
+
+@pytest.mark.asyncio
+async def test_safety_check_extracts_topics_in_one_pass():
+    result = await safety_check({"query": "Exam stress keeps me up, more STRESS than sleep"})
+    assert result["safety_triggered"] is False
+    assert result["topics"] == ["exam", "stress", "sleep"]
+
+@pytest.mark.asyncio
+async def test_retrieve_context_keeps_graph_facts_when_vector_search_fails(monkeypatch):
+    async def failing_search(query):
+        raise ConnectionError("weaviate down")
+    
+    async def related(topic):
+        return [{"source": topic, "target": "Breathing"}]
+    
+    monkeypatch.setattr(pipeline_module, "_search_documents", failing_search)
+    monkeypatch.setattr(pipeline_module.graphdb, "get_related_entities", related)
+    result = await pipeline_module.retrieve_context({"query": "exam stress", "topics": ["exam"]})
+    assert result == {"context_blocks": ["exam → Breathing"], "sources": []}
+
+@pytest.mark.asyncio
+async def test_generate_response_sends_history_and_skips_shared_cache(monkeypatch):
+    from langchain_core.messages import AIMessageChunk
+    sent = []
+    
+    class RecordingModel:
+        async def astream(self, messages):
+            sent.extend(messages)
+            yield AIMessageChunk(content="Let's try that again.")
+    
+    async def fail(*args, **kwargs):
+        raise AssertionError("follow-up turns must not touch the response cache")
+    
+    monkeypatch.setattr(pipeline_module, "get_chat_model", lambda: RecordingModel())
+    monkeypatch.setattr(pipeline_module.cache, "get_cached_response", fail)
+    monkeypatch.setattr(pipeline_module.cache, "cache_response", fail)
+    history = [{"role": "user", "content": "I can't sleep"}, {"role": "assistant", "content": "Try a wind-down routine."}]
+    result = await pipeline_module.generate_response({"query": "It didn't help", "history": history}, writer=lambda chunk: None)
+    assert result == {"response": ["Let's try that again."]}
+    assert [m.type for m in sent] == ["system", "human", "ai", "human"]
+    assert sent[-1].content == "It didn't help"
+
+@pytest.mark.asyncio
+async def test_search_documents_reuses_cached_results(monkeypatch):
+    hits = [{"chunk_id": "c1", "content": "Breathe slowly", "doc_id": "d1"}]
+    
+    async def cached_search(query, top_k):
+        return hits
+    
+    async def fail(*args, **kwargs):
+        raise AssertionError("a cached search must not embed the query")
+    
+    monkeypatch.setattr(pipeline_module.cache, "get_cached_search", cached_search)
+    monkeypatch.setattr(pipeline_module.embed_batcher, "embed", fail)
+    assert await pipeline_module._search_documents("exam stress") == hits
+
+@pytest.mark.asyncio
+async def test_generate_response_falls_back_on_malformed_history(monkeypatch):
+    async def miss(*args, **kwargs):
+        return None
+    
+    monkeypatch.setattr(pipeline_module.cache, "get_cached_response", miss)
+    result = await pipeline_module.generate_response({"query": "Still anxious", "history": [{"role": "user"}]}, writer=lambda chunk: None)
+    assert result == {"response": [pipeline_module.FALLBACK_RESPONSE]}
+
+@pytest.mark.asyncio
+async def test_retrieve_vectors_skips_hits_without_content(monkeypatch):
+    async def search(query):
+        return [{"chunk_id": "c1", "content": "", "doc_id": "d1"}, {"chunk_id": "c2", "content": "Breathe", "doc_id": "d1"}]
+    
+    monkeypatch.setattr(pipeline_module, "_search_documents", search)
+    assert await pipeline_module._retrieve_vectors("exam stress") == (["Breathe"], ["c2"])
+
+@pytest.mark.asyncio
+async def test_generate_response_streams_text_from_content_blocks(monkeypatch):
+    from langchain_core.messages import AIMessageChunk
+    written = []
+    
+    class BlockModel:
+        async def astream(self, messages):
+            yield AIMessageChunk(content=[{"type": "text", "text": "Breathe "}, {"type": "tool_use", "id": "t1"}])
+            yield AIMessageChunk(content=[{"type": "text", "text": "slowly."}])
+    
+    async def miss(*args, **kwargs):
+        return None
+    
+    async def store(*args, **kwargs):
+        return True
+    
+    monkeypatch.setattr(pipeline_module, "get_chat_model", lambda: BlockModel())
+    monkeypatch.setattr(pipeline_module.cache, "get_cached_response", miss)
+    monkeypatch.setattr(pipeline_module.cache, "cache_response", store)
+    result = await pipeline_module.generate_response({"query": "I feel tense"}, writer=written.append)
+    assert result == {"response": ["Breathe slowly."]}
+    assert written == ["Breathe ", "slowly."]
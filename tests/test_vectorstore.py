@@ -0,0 +1,69 @@
+"""Vector store tests"""
+from __future__ import annotations
+from types import SimpleNamespace
+import pytest
+from weaviate.exceptions import WeaviateConnectionError
+from graph_rag.services.vectorstore import VectorStore
+
+def test_search_reconnects_once_after_connection_error(monkeypatch):
+    calls = []
+    stale, fresh = SimpleNamespace(name="stale"), SimpleNamespace(name="fresh")
+    handles = [(object(), stale), (object(), fresh)]
+    
+    def near_vector(collection, query_vector, top_k):
+        calls.append(collection.name)
+        if collection is stale:
+            raise WeaviateConnectionError("grpc channel closed")
+        return SimpleNamespace(objects=[SimpleNamespace(properties={"chunk_id": "c1", "content": "Breathe", "doc_id": "d1"})])
+    
+    monkeypatch.setattr(VectorStore, "_handles", classmethod(lambda cls: handles[0]))
+    monkeypatch.setattr(VectorStore, "_near_vector", staticmethod(near_vector))
+    monkeypatch.setattr(VectorStore, "_discard", classmethod(lambda cls, client: (calls.append("discard"), handles.pop(0))))
+    assert VectorStore.search([0.1, 0.2], top_k=3) == [{"chunk_id": "c1", "content": "Breathe", "doc_id": "d1"}]
+    assert calls == ["stale", "discard", "fresh"]
+
+def test_search_keeps_client_on_query_errors(monkeypatch):
+    def near_vector(collection, query_vector, top_k):
+        raise ValueError("vector dimension mismatch")
+    
+    def discard(cls, client):
+        raise AssertionError("a bad query must not drop the shared client")
+    
+    monkeypatch.setattr(VectorStore, "_handles", classmethod(lambda cls: (object(), object())))
+    monkeypatch.setattr(VectorStore, "_near_vector", staticmethod(near_vector))
+    monkeypatch.setattr(VectorStore, "_discard", classmethod(discard))
+    with pytest.raises(ValueError):
+        VectorStore.search([0.1], top_k=3)
+
+def test_discard_ignores_an_already_replaced_client(monkeypatch):
+    replacement = SimpleNamespace(close=lambda: (_ for _ in ()).throw(AssertionError("closed the live client")))
+    monkeypatch.setattr(VectorStore, "_client", replacement)
+    VectorStore._discard(object())
+    assert VectorStore._client is replacement
+
+def test_insert_reports_rejected_objects(monkeypatch):
+    added = []
+    
+    class FakeBatch:
+        failed_objects = [SimpleNamespace(message="vector length mismatch")]
+        def fixed_size(self, **kwargs):
+            return self
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def add_object(self, **obj):
+            added.append(obj)
+    
+    client = SimpleNamespace(collections=SimpleNamespace(get=lambda name: SimpleNamespace(batch=FakeBatch())))
+    monkeypatch.setattr(VectorStore, "connect", classmethod(lambda cls: client))
+    assert VectorStore.insert([[0.1], [0.2]], ["c1", "c2"], ["a", "b"], doc_id="d1") == 1
+    assert [o["properties"]["chunk_id"] for o in added] == ["c1", "c2"]
+
+def test_search_defaults_missing_properties(monkeypatch):
+    def near_vector(collection, query_vector, top_k):
+        return SimpleNamespace(objects=[SimpleNamespace(properties={"chunk_id": "c1"})])
+    
+    monkeypatch.setattr(VectorStore, "_handles", classmethod(lambda cls: (object(), object())))
+    monkeypatch.setattr(VectorStore, "_near_vector", staticmethod(near_vector))
+    assert VectorStore.search([0.1], top_k=1) == [{"chunk_id": "c1", "content": "", "doc_id": ""}]